@@ -1,14 +1,37 @@
 import streamlit as st
-import pandas as pd
 import requests
 import json
+import orjson
 import io
+import os
 import csv
-import glob
-import urllib.parse
-import difflib
+import hashlib
+import sqlite3
+from urllib.parse import urlparse, quote
+from functools import lru_cache
 import time
-from bs4 import BeautifulSoup
+import threading
+import concurrent.futures
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from rapidfuzz.fuzz import partial_ratio
+except ImportError:
+    partial_ratio = None
+from requests.adapters import HTTPAdapter
+
+try:
+    import lxml  # noqa: F401
+
+    BS_PARSER = "lxml"
+except ImportError:
+    BS_PARSER = "html.parser"
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+from urllib3.util.retry import Retry
 from google.oauth2 import service_account
 import vertexai
 from vertexai.generative_models import GenerativeModel, GenerationConfig
@@ -16,10 +39,143 @@ from vertexai.generative_models import GenerativeModel, GenerationConfig
 # --- CONFIGURATION ---
 st.set_page_config(page_title="AI SEO Auditor", page_icon="🧠", layout="wide")
 
+# Concurrency caps: scraping is network-bound so it parallelizes well, but we
+# keep it bounded (per-host politeness) and give the AI stage its own smaller pool.
+SCRAPE_WORKERS = 16
+AI_WORKERS = 5
+
+# Cap on how much of a page we download and parse. A misconfigured URL
+# (huge HTML, runaway CMS output) would otherwise pin a worker for the
+# whole timeout and burn parser CPU; 2 MB is far beyond any sane page.
+MAX_HTML_BYTES = 2_000_000
+
+# One shared Session so repeated requests to the same host reuse keep-alive
+# connections instead of paying a fresh TCP+TLS handshake per URL.
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "Mozilla/5.0 (SEO-Auditor)"})
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504]),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+# Disk cache for Gemini responses: templated sites repeat the same
+# title/desc/content across many pages, and re-runs repeat everything, so a
+# content-hash cache skips most LLM calls on second and later audits.
+# Bump PROMPT_VERSION whenever the prompt changes to invalidate old entries.
+PROMPT_VERSION = "v1"
+GEMINI_CACHE_PATH = ".gemini_cache.sqlite"
+GEMINI_CACHE_TTL = 7 * 86400
+
+
+def _gemini_cache_conn():
+    conn = sqlite3.connect(GEMINI_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS gemini_cache (key TEXT PRIMARY KEY, json_response TEXT, ts REAL)"
+    )
+    return conn
+
+
+def _gemini_cache_get(key):
+    try:
+        conn = _gemini_cache_conn()
+        try:
+            row = conn.execute(
+                "SELECT json_response, ts FROM gemini_cache WHERE key = ?", (key,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row and time.time() - row[1] < GEMINI_CACHE_TTL:
+            return orjson.loads(row[0])
+    except Exception:
+        pass
+    return None
+
+
+def _gemini_cache_set(key, result):
+    try:
+        conn = _gemini_cache_conn()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO gemini_cache VALUES (?, ?, ?)",
+                    (key, json.dumps(result), time.time()),
+                )
+        finally:
+            conn.close()
+    except Exception:
+        pass
+
+
+# Conditional-GET cache for scraped pages: we remember each URL's ETag /
+# Last-Modified plus the parsed result, revalidate with If-None-Match /
+# If-Modified-Since, and skip the download and parse entirely on a 304.
+SCRAPE_CACHE_PATH = ".scrape_cache.sqlite"
+
+
+def _scrape_cache_conn():
+    conn = sqlite3.connect(SCRAPE_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS scrape_cache "
+        "(url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, parsed TEXT, ts REAL)"
+    )
+    return conn
+
+
+def _scrape_cache_get(url):
+    try:
+        conn = _scrape_cache_conn()
+        try:
+            row = conn.execute(
+                "SELECT etag, last_modified, parsed FROM scrape_cache WHERE url = ?", (url,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row:
+            parsed = orjson.loads(row[2])
+            # Entries written before the parsed-schema rename are stale;
+            # treat them as misses so they get refetched and rewritten.
+            if "Schema Parsed" in parsed:
+                return {"etag": row[0], "last_modified": row[1], "parsed": parsed}
+    except Exception:
+        pass
+    return None
+
+
+def _scrape_cache_set(url, etag, last_modified, parsed):
+    if not etag and not last_modified:
+        return  # no validator to revalidate against, nothing worth storing
+    try:
+        conn = _scrape_cache_conn()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO scrape_cache VALUES (?, ?, ?, ?, ?)",
+                    (url, etag, last_modified, json.dumps(parsed), time.time()),
+                )
+        finally:
+            conn.close()
+    except Exception:
+        pass
+
+
+def _gemini_cache_key(content_text, meta_data, schema_data):
+    raw = (
+        content_text[:2000]
+        + meta_data["Title"]
+        + meta_data["Meta Description"]
+        + repr(sorted(str(s) for s in schema_data))
+        + PROMPT_VERSION
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
 if "seo_results" not in st.session_state:
     st.session_state["seo_results"] = []
 
 # --- AUTHENTICATION ---
+@st.cache_resource(show_spinner=False)
 def get_creds():
     creds_info = None
     if "gcp_service_account" in st.secrets:
@@ -31,14 +187,15 @@ def get_creds():
             pass
 
     if not creds_info:
-        for k in glob.glob("*.json"):
-            if "service_account" in k or "qc" in k:
-                try:
-                    with open(k, "r") as f:
-                        creds_info = json.load(f)
-                        break
-                except Exception:
-                    continue
+        # One known location instead of globbing the working directory:
+        # GCP_SA_PATH if set, otherwise the conventional filename.
+        sa_path = os.environ.get("GCP_SA_PATH", "service_account.json")
+        if os.path.exists(sa_path):
+            try:
+                with open(sa_path, "r") as f:
+                    creds_info = json.load(f)
+            except Exception:
+                pass
 
     if creds_info:
         return service_account.Credentials.from_service_account_info(
@@ -49,28 +206,20 @@ def get_creds():
 
 
 # --- CSV HELPERS (NEW) ---
-def detect_csv_columns(rows):
-    """Return (url_key, title_key, headers)."""
-    if not rows:
-        return None, None, []
+URL_CANDIDATES = ("url", "page url", "page_url", "loc", "link", "address")
+TITLE_CANDIDATES = ("page title", "title", "page", "name")
 
-    headers = [h for h in rows[0].keys() if h]
-    headers_norm = {h.strip().lower(): h for h in headers}
 
-    url_candidates = ["url", "page url", "page_url", "loc", "link", "address"]
-    title_candidates = ["page title", "title", "page", "name"]
+def detect_csv_columns(fieldnames):
+    """Return (url_key, title_key, headers) from a CSV header row."""
+    if not fieldnames:
+        return None, None, []
 
-    url_key = None
-    for cand in url_candidates:
-        if cand in headers_norm:
-            url_key = headers_norm[cand]
-            break
+    headers = [h for h in fieldnames if h]
+    headers_norm = {h.strip().lower(): h for h in headers}
 
-    title_key = None
-    for cand in title_candidates:
-        if cand in headers_norm:
-            title_key = headers_norm[cand]
-            break
+    url_key = next((headers_norm[c] for c in URL_CANDIDATES if c in headers_norm), None)
+    title_key = next((headers_norm[c] for c in TITLE_CANDIDATES if c in headers_norm), None)
 
     # If there is only one column, assume it's the URL column
     if not url_key and len(headers) == 1:
@@ -80,57 +229,192 @@ def detect_csv_columns(rows):
 
 
 # --- AI ANALYSIS (Now Prescribes Schema) ---
-def analyze_with_gemini(content_text, meta_data, schema_data, creds):
+# Pages audited per Gemini call; one prompt returning a JSON array amortizes
+# the round-trip latency across the whole batch.
+GEMINI_BATCH_SIZE = 10
+
+_RESULT_KEYS = ("rating", "writing_quality", "suggested_desc", "schema_prescription")
+
+# Static audit rubric, passed as the system instruction. Keeping every
+# dynamic value out of this block means all calls share a long identical
+# prefix, which lets Gemini's implicit context caching kick in and bill the
+# rubric tokens at the cached rate after the first request.
+SYSTEM_PREFIX = (
+    "Act as a Technical SEO Expert. Audit EACH numbered page sent to you "
+    "independently.\n\n"
+    "TASKS (per page):\n"
+    "1. LOCAL CHECK: If it is a physical location page, is 'MedicalClinic' present?\n"
+    "2. RATING: Rate Title/Content alignment (High/Medium/Low).\n"
+    "3. WRITING: Grade Desc quality (Professional/Awkward/Poor).\n"
+    "4. **THE FIX (Meta Desc):**\n"
+    "   If the current Desc is 'Likely Rewrite' or 'Awkward', write a BETTER one (Max 160 chars).\n"
+    '   If it\'s good, return "Keep Current".\n'
+    "5. **THE PRESCRIPTION (Schema):**\n"
+    "   Look at the content. What is the SINGLE best Schema.org Type for the page?\n"
+    '   - If it\'s a Bio -> Suggest "Physician"\n'
+    '   - If it\'s a Disease info page -> Suggest "MedicalCondition"\n'
+    '   - If it\'s a Service page -> Suggest "MedicalProcedure" or "Service"\n'
+    '   - If it\'s a Blog -> Suggest "BlogPosting"\n'
+    "   COMPARE with the page's EXISTING SCHEMA. If the specific type is missing, recommend it.\n"
+    '   If the existing schema is already perfect, return "✅ Optimal".\n\n'
+    "OUTPUT JSON: an array with one object per page:\n"
+    '[{"id": 0, "rating": "...", "writing_quality": "...", '
+    '"suggested_desc": "...", "schema_prescription": "..."}]'
+)
+
+_BATCH_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "integer"},
+            "rating": {"type": "string"},
+            "writing_quality": {"type": "string"},
+            "suggested_desc": {"type": "string"},
+            "schema_prescription": {"type": "string"},
+        },
+        "required": ["id", "rating", "writing_quality", "suggested_desc", "schema_prescription"],
+    },
+}
+
+
+# Official Schema.org types the auditor may prescribe. Validating against
+# this set in Python mirrors the "JSON Valid" check: membership is O(1) and
+# a hallucinated type never reaches the report, so the model doesn't have to
+# be re-told (and re-billed for) an allowed-types rule on every call.
+SCHEMA_TYPES = frozenset(
+    {
+        "AboutPage",
+        "Article",
+        "BlogPosting",
+        "BreadcrumbList",
+        "ContactPage",
+        "Dentist",
+        "Drug",
+        "FAQPage",
+        "Hospital",
+        "HowTo",
+        "LocalBusiness",
+        "MedicalBusiness",
+        "MedicalClinic",
+        "MedicalCondition",
+        "MedicalOrganization",
+        "MedicalProcedure",
+        "MedicalTest",
+        "MedicalTherapy",
+        "MedicalWebPage",
+        "NewsArticle",
+        "Organization",
+        "Person",
+        "Physician",
+        "Product",
+        "Review",
+        "Service",
+        "VideoObject",
+        "WebPage",
+    }
+)
+
+
+def _validate_prescription(value):
+    """Keep only official Schema.org types (or the Optimal sentinel)."""
+    if not value or "Optimal" in value or value in SCHEMA_TYPES:
+        return value
+    # Tolerate phrasing like "Add Physician" by checking the last word
+    words = value.strip().rstrip(".").split()
+    if words and words[-1] in SCHEMA_TYPES:
+        return words[-1]
+    return ""
+
+
+_BATCH_GEN_CONFIG = GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=_BATCH_RESPONSE_SCHEMA,
+)
+
+
+@st.cache_resource(show_spinner=False)
+def get_model(_creds):
+    """Init Vertex once per session and return the shared batch model.
+
+    The leading underscore tells Streamlit not to hash the credentials
+    object (it isn't hashable); the singleton is shared across reruns and
+    worker threads.
+    """
+    vertexai.init(project=_creds.project_id, location="us-central1", credentials=_creds)
+    return GenerativeModel("gemini-2.5-flash", system_instruction=SYSTEM_PREFIX)
+
+
+# Explicit Vertex CachedContent for the rubric was tried and backed out:
+# SYSTEM_PREFIX is ~400 tokens, well under the 1,024-token minimum for
+# gemini-2.5-flash context caching, so CachedContent.create always failed
+# and every run paid a doomed RPC. Padding the rubric past the minimum
+# just to cache it would cost more tokens than it saves at this size;
+# implicit prefix caching on the shared system instruction still applies.
+def analyze_batch_with_gemini(pages, creds):
+    """Audit a batch of pages with a single Gemini call.
+
+    Each page is a dict with "content", "meta" and "schema" keys. Returns a
+    list of result dicts in the same order. Pages already in the disk cache
+    are served from it; only the misses go to the model.
+    """
+    results = [None] * len(pages)
+    misses = []
+    for i, page in enumerate(pages):
+        key = _gemini_cache_key(page["content"], page["meta"], page["schema"])
+        cached = _gemini_cache_get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            misses.append((i, key, page))
+
+    if not misses:
+        return results
+
     try:
-        vertexai.init(project=creds.project_id, location="us-central1", credentials=creds)
-        model = GenerativeModel("gemini-2.5-flash")
-
-        prompt = f"""
-        Act as a Technical SEO Expert.
-
-        1. PAGE CONTENT: "{content_text[:2500]}"
-        2. METADATA: Title: "{meta_data['Title']}" | Desc: "{meta_data['Meta Description']}"
-        3. EXISTING SCHEMA: {schema_data}
-
-        TASKS:
-        1. LOCAL CHECK: If this is a physical location page, is 'MedicalClinic' present?
-        2. RATING: Rate Title/Content alignment (High/Medium/Low).
-        3. WRITING: Grade Desc quality (Professional/Awkward/Poor).
-
-        4. **THE FIX (Meta Desc):**
-           If the current Desc is 'Likely Rewrite' or 'Awkward', write a BETTER one (Max 160 chars).
-           If it's good, return "Keep Current".
-
-        5. **THE PRESCRIPTION (Schema):**
-           Look at the content. What is the SINGLE best Schema.org Type for this page?
-           - If it's a Bio -> Suggest "Physician"
-           - If it's a Disease info page -> Suggest "MedicalCondition"
-           - If it's a Service page -> Suggest "MedicalProcedure" or "Service"
-           - If it's a Blog -> Suggest "BlogPosting"
-
-           COMPARE with "Existing Schema". If the specific type is missing, recommend it.
-           If the existing schema is already perfect, return "✅ Optimal".
-
-        OUTPUT JSON: {{
-            "rating": "...",
-            "writing_quality": "...",
-            "suggested_desc": "...",
-            "schema_prescription": "..."
-        }}
-        """
+        model = get_model(creds)
+
+        page_blocks = []
+        for batch_id, (_, _, page) in enumerate(misses):
+            page_blocks.append(
+                f"PAGE {batch_id}:\n"
+                f"CONTENT: \"{page['content'][:2500]}\"\n"
+                f"METADATA: Title: \"{page['meta']['Title']}\" | Desc: \"{page['meta']['Meta Description']}\"\n"
+                f"EXISTING SCHEMA: {page['schema']}"
+            )
 
         response = model.generate_content(
-            prompt,
-            generation_config=GenerationConfig(response_mime_type="application/json"),
+            "\n\n".join(page_blocks),
+            generation_config=_BATCH_GEN_CONFIG,
         )
-        return json.loads(response.text)
+        parsed = orjson.loads(response.text)
+        by_id = {item.get("id"): item for item in parsed if isinstance(item, dict)}
+
+        for batch_id, (i, key, _page) in enumerate(misses):
+            item = by_id.get(batch_id)
+            if item is None:
+                results[i] = {
+                    "rating": "Error",
+                    "writing_quality": "Error",
+                    "suggested_desc": "",
+                    "schema_prescription": "No result returned for page",
+                }
+            else:
+                result = {k: item.get(k, "") for k in _RESULT_KEYS}
+                result["schema_prescription"] = _validate_prescription(
+                    result["schema_prescription"]
+                )
+                _gemini_cache_set(key, result)
+                results[i] = result
     except Exception as e:
-        return {
-            "rating": "Error",
-            "writing_quality": "Error",
-            "suggested_desc": "",
-            "schema_prescription": str(e),
-        }
+        for i, _key, _page in misses:
+            results[i] = {
+                "rating": "Error",
+                "writing_quality": "Error",
+                "suggested_desc": "",
+                "schema_prescription": str(e),
+            }
+    return results
 
 
 # --- SCORING ---
@@ -173,51 +457,192 @@ def calculate_score(data, ai_result):
     return max(0, score), ", ".join(reasons)
 
 
+# Pure functions of the URL; sitemaps repeat hosts and rows repeat URLs, so
+# a small LRU saves the re-parse/re-quote on every duplicate reference.
+@lru_cache(maxsize=4096)
+def normalize_audit_url(url):
+    """Collapse tracking params, fragments and trailing slashes for dedup."""
+    parts = urlparse(url)
+    return parts._replace(fragment="", query="").geturl().rstrip("/")
+
+
+@lru_cache(maxsize=4096)
+def _url_path(url):
+    return urlparse(url).path
+
+
+@lru_cache(maxsize=4096)
+def _quoted(url):
+    return quote(url)
+
+
+def _ngrams(s, n=5):
+    return {s[i : i + n] for i in range(len(s) - n + 1)}
+
+
+def _echo_score(meta_desc, body_text):
+    """0-100 similarity for 'is the meta description lifted from the body'."""
+    if partial_ratio is not None:
+        return partial_ratio(meta_desc, body_text[: len(meta_desc) + 50])
+    # Fallback without rapidfuzz: character 5-gram containment — the share
+    # of the description's n-grams found in the leading body window. Unlike
+    # Jaccard, the body window's extra n-grams don't dilute the score, so a
+    # verbatim-lifted description still lands near 100 against the same 85
+    # threshold. Hash-set overlap is O(n), cheap per page even in Python.
+    a = _ngrams(meta_desc)
+    b = _ngrams(body_text[: len(meta_desc) + 200])
+    return 100 * len(a & b) / max(1, len(a))
+
+
 # --- SCRAPER ---
-def scrape_seo_data(url):
-    try:
-        headers = {"User-Agent": "Mozilla/5.0 (SEO-Auditor)"}
-        resp = requests.get(url, headers=headers, timeout=20)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        title = soup.find("title").get_text().strip() if soup.find("title") else "MISSING"
-        h1 = soup.find("h1").get_text().strip() if soup.find("h1") else "MISSING"
-        meta = soup.find("meta", attrs={"name": "description"})
-        meta_desc = meta["content"].strip() if meta and meta.get("content") else "MISSING"
-
-        schemas = []
-        valid_json = True
-        for s in soup.find_all("script", type="application/ld+json"):
-            if s.string:
-                try:
-                    json.loads(s.string)
-                    schemas.append(s.string)
-                except json.JSONDecodeError:
-                    valid_json = False
-
-        content_area = soup.find(class_="page-content-area")
+def _extract_with_selectolax(html_bytes):
+    """Pull the audit fields out of a page with selectolax (C parser)."""
+    tree = HTMLParser(html_bytes)
+
+    t = tree.css_first("title")
+    title = t.text(strip=True) if t else "MISSING"
+    h = tree.css_first("h1")
+    h1 = h.text(strip=True) if h else "MISSING"
+    m = tree.css_first('meta[name="description"]')
+    meta_content = (m.attributes.get("content") or "").strip() if m else ""
+    meta_desc = meta_content if meta_content else "MISSING"
+
+    schemas = []
+    valid_json = True
+    for node in tree.css('script[type="application/ld+json"]'):
+        s = node.text()
+        if s:
+            try:
+                schemas.append(orjson.loads(s))
+            except ValueError:
+                valid_json = False
+
+    content_area = (
+        tree.css_first(".page-content-area") or tree.css_first("main") or tree.css_first("article")
+    )
+    if content_area:
+        body_text = content_area.text(separator=" ").strip()
+    else:
+        for n in tree.css("script,style,nav,footer"):
+            n.decompose()
+        body = tree.body or tree.root
+        body_text = body.text(separator=" ").strip() if body else ""
+
+    return title, h1, meta_desc, schemas, valid_json, body_text
+
+
+# The strainers keep parse-time object creation down to the handful of tags
+# we actually read instead of wrapping the whole document; built once here
+# rather than per page.
+_META_STRAINER = SoupStrainer(["title", "h1", "meta", "script"])
+_CONTENT_STRAINER = SoupStrainer(class_="page-content-area")
+
+
+def _extract_with_bs4(html_bytes):
+    """BeautifulSoup fallback extractor, used when selectolax is missing."""
+    soup = BeautifulSoup(html_bytes, BS_PARSER, parse_only=_META_STRAINER)
+
+    t = soup.select_one("title")
+    title = t.get_text().strip() if t else "MISSING"
+    h = soup.select_one("h1")
+    h1 = h.get_text().strip() if h else "MISSING"
+    meta = soup.select_one('meta[name="description"]')
+    meta_desc = meta["content"].strip() if meta and meta.get("content") else "MISSING"
+
+    schemas = []
+    valid_json = True
+    for s in soup.find_all("script", type="application/ld+json"):
+        if s.string:
+            try:
+                # orjson is a C/Rust parser; JSONDecodeError is a
+                # ValueError subclass so the catch stays portable.
+                schemas.append(orjson.loads(s.string))
+            except ValueError:
+                valid_json = False
+
+    # Second, targeted pass for the body text: try the known content
+    # containers first and only build the full tree as a last resort.
+    content_soup = BeautifulSoup(html_bytes, BS_PARSER, parse_only=_CONTENT_STRAINER)
+    content_area = content_soup.select_one(".page-content-area")
+    if content_area:
+        body_text = content_area.get_text(separator=" ").strip()
+    else:
+        full_soup = BeautifulSoup(html_bytes, BS_PARSER)
+        content_area = full_soup.select_one("main, article")
         if content_area:
             body_text = content_area.get_text(separator=" ").strip()
         else:
-            for tag in soup(["script", "style", "nav", "footer"]):
+            for tag in full_soup(["script", "style", "nav", "footer"]):
                 tag.decompose()
-            body_text = soup.get_text(separator=" ").strip()
+            body_text = full_soup.get_text(separator=" ").strip()
+
+    return title, h1, meta_desc, schemas, valid_json, body_text
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def scrape_seo_data(url):
+    try:
+        cached = _scrape_cache_get(url)
+        cond_headers = {}
+        if cached:
+            if cached["etag"]:
+                cond_headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                cond_headers["If-Modified-Since"] = cached["last_modified"]
+
+        resp = SESSION.get(url, headers=cond_headers, timeout=(5, 15), stream=True)
+        # Streamed responses must be closed on every path (skip, cap break),
+        # or the connection never returns to the keep-alive pool.
+        with resp:
+            if resp.status_code == 304 and cached:
+                return cached["parsed"]
+            resp.raise_for_status()
+
+            ctype = resp.headers.get("Content-Type", "")
+            if ctype and not ctype.startswith("text/html"):
+                return {"Error": f"Skipped non-HTML content ({ctype.split(';')[0]})"}
+
+            chunks = []
+            read = 0
+            for chunk in resp.iter_content(chunk_size=65536):
+                chunks.append(chunk)
+                read += len(chunk)
+                if read >= MAX_HTML_BYTES:
+                    break
+            html_bytes = b"".join(chunks)
+
+        if HTMLParser is not None:
+            title, h1, meta_desc, schemas, valid_json, body_text = _extract_with_selectolax(
+                html_bytes
+            )
+        else:
+            title, h1, meta_desc, schemas, valid_json, body_text = _extract_with_bs4(
+                html_bytes
+            )
+
+        # Only the leading slice of the body is ever used (the echo window
+        # plus the 2500 chars sent to Gemini), so compress whitespace and
+        # trim here — multi-hundred-KB strings stop crossing the cache and
+        # call boundaries.
+        body_text = " ".join(body_text.split())[:2500]
 
         echo_score = 0
         if meta_desc != "MISSING" and body_text:
-            matcher = difflib.SequenceMatcher(None, meta_desc, body_text[: len(meta_desc) + 50])
-            echo_score = matcher.ratio() * 100
+            echo_score = _echo_score(meta_desc, body_text)
 
-        return {
+        result = {
             "Title": title,
             "H1": h1,
             "Meta Description": meta_desc,
-            "Schema Raw": schemas,
+            "Schema Parsed": schemas,
             "JSON Valid": valid_json,
             "Body Text": body_text,
             "Echo Score": echo_score,
         }
+        _scrape_cache_set(
+            url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), result
+        )
+        return result
     except Exception as e:
         return {"Error": str(e)}
 
@@ -243,14 +668,16 @@ if st.button("Run Audit", type="primary"):
         st.warning("Please upload a CSV first.")
         st.stop()
 
-    stringio = io.StringIO(csv_file.getvalue().decode("utf-8-sig"))
-    rows = list(csv.DictReader(stringio))
+    # Stream the upload row by row: no full-file decode into a str and no
+    # list of row dicts — only the slim task records below stay resident.
+    text_stream = io.TextIOWrapper(csv_file, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text_stream)
 
-    if not rows:
+    if not reader.fieldnames:
         st.error("CSV appears empty or has no header row.")
         st.stop()
 
-    url_key, title_key, headers = detect_csv_columns(rows)
+    url_key, title_key, headers = detect_csv_columns(reader.fieldnames)
 
     if not url_key:
         st.error(f"Couldn't find a URL column. Your headers are: {headers}")
@@ -265,10 +692,10 @@ if st.button("Run Audit", type="primary"):
     bar = st.progress(0)
     status = st.empty()
 
-    total_rows = len(rows)
-    processed = 0
-
-    for i, row in enumerate(rows):
+    # Pre-process rows into audit tasks (cheap, sequential)
+    staging_prefix = f"https://{staging_domain}" if use_staging and staging_domain else ""
+    tasks = []
+    for row in reader:
         csv_title = row.get(title_key, "") if title_key else row.get("Page Title", "")
         url = row.get(url_key, "")
 
@@ -281,19 +708,127 @@ if st.button("Run Audit", type="primary"):
         if not url.startswith(("http://", "https://")):
             url = "https://" + url
 
-        if use_staging and staging_domain:
-            from urllib.parse import urlparse
-
-            path = urlparse(url).path
-            url = f"https://{staging_domain}{path}"
+        if staging_prefix:
+            url = staging_prefix + _url_path(url)
 
         display_name = csv_title.strip() if isinstance(csv_title, str) and csv_title.strip() else url
-        status.text(f"[{i+1}/{total_rows}] 🕷️ Scraping: {display_name}...")
-
-        time.sleep(0.2)
-        data = scrape_seo_data(url)
+        tasks.append({"url": url, "csv_title": csv_title, "display_name": display_name})
+
+    processed = len(tasks)
+
+    # Phase 1: scrape all URLs concurrently. The semaphore caps in-flight
+    # requests so one host never sees more than SCRAPE_WORKERS at once;
+    # no fixed sleep — the cap itself does the pacing.
+    scrape_sem = threading.Semaphore(SCRAPE_WORKERS)
+
+    def _scrape_task(url):
+        with scrape_sem:
+            return scrape_seo_data(url)
+
+    if tasks:
+        # Sitemaps routinely repeat URLs modulo tracking params / trailing
+        # slashes; scrape each normalized URL once and fan the result back
+        # to every row that referenced it.
+        unique_urls = {}
+        for t in tasks:
+            t["norm"] = normalize_audit_url(t["url"])
+            unique_urls.setdefault(t["norm"], t["url"])
+
+        done = 0
+        total_unique = len(unique_urls)
+        scraped = {}
+        scrape_workers = min(SCRAPE_WORKERS, total_unique)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=scrape_workers) as pool:
+            futures = {
+                pool.submit(_scrape_task, url): norm for norm, url in unique_urls.items()
+            }
+            for fut in concurrent.futures.as_completed(futures):
+                scraped[futures[fut]] = fut.result()
+                done += 1
+                status.text(f"[{done}/{total_unique}] 🕷️ Scraped: {futures[fut]}")
+                bar.progress(done / total_unique)
+
+        for task in tasks:
+            task["data"] = scraped[task["norm"]]
+
+    # Fix up display names and flatten found schema now that we have page data
+    for task in tasks:
+        data = task["data"]
+        if "Error" in data:
+            continue
 
-        processed += 1
+        csv_title = task["csv_title"]
+        if not (isinstance(csv_title, str) and csv_title.strip()):
+            task["display_name"] = data["Title"]
+
+        # An ld+json block may hold a single node, a @graph wrapper, or a
+        # top-level list of nodes (previously skipped silently).
+        schema_list = []
+        for obj in data["Schema Parsed"]:
+            if isinstance(obj, dict):
+                # @graph can hold anything in the wild (null, a string...);
+                # only trust it when it is actually a list of nodes.
+                graph = obj.get("@graph")
+                nodes = graph if isinstance(graph, list) else [obj]
+            elif isinstance(obj, list):
+                nodes = obj
+            else:
+                continue
+            for item in nodes:
+                if isinstance(item, dict):
+                    schema_list.append(item.get("@type", "Unknown"))
+
+        flat_schema = []
+        for item in schema_list:
+            if isinstance(item, list):
+                flat_schema.extend(item)
+            else:
+                flat_schema.append(item)
+
+        task["flat_schema"] = flat_schema
+
+    # Phase 2: AI analysis on successfully scraped pages, also concurrent but
+    # with a smaller pool to stay under the Vertex QPS limit.
+    ai_tasks = [t for t in tasks if use_ai and "Error" not in t["data"]]
+    if ai_tasks:
+        bar.progress(0)
+        done = 0
+        chunks = [
+            ai_tasks[i : i + GEMINI_BATCH_SIZE]
+            for i in range(0, len(ai_tasks), GEMINI_BATCH_SIZE)
+        ]
+
+        def _chunk_pages(chunk):
+            return [
+                {
+                    "content": t["data"]["Body Text"],
+                    "meta": {
+                        "Title": t["data"]["Title"],
+                        "Meta Description": t["data"]["Meta Description"],
+                    },
+                    "schema": t["flat_schema"],
+                }
+                for t in chunk
+            ]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=AI_WORKERS) as pool:
+            futures = {
+                pool.submit(analyze_batch_with_gemini, _chunk_pages(c), creds): c
+                for c in chunks
+            }
+            for fut in concurrent.futures.as_completed(futures):
+                chunk = futures[fut]
+                for task, feedback in zip(chunk, fut.result()):
+                    task["ai_feedback"] = feedback
+                done += len(chunk)
+                status.text(f"[{done}/{len(ai_tasks)}] 🤖 Analyzed: {len(chunk)} page(s)")
+                bar.progress(done / len(ai_tasks))
+
+    # Assemble results in original row order
+    for task in tasks:
+        data = task["data"]
+        url = task["url"]
+        display_name = task["display_name"]
 
         if "Error" in data:
             results.append(
@@ -314,40 +849,11 @@ if st.button("Run Audit", type="primary"):
                 }
             )
         else:
-            if not (isinstance(csv_title, str) and csv_title.strip()):
-                display_name = data["Title"]
-
-            schema_list = []
-            for s in data["Schema Raw"]:
-                try:
-                    j = json.loads(s)
-                    if "@graph" in j:
-                        for item in j["@graph"]:
-                            schema_list.append(item.get("@type", "Unknown"))
-                    else:
-                        schema_list.append(j.get("@type", "Unknown"))
-                except Exception:
-                    pass
-
-            flat_schema = []
-            for item in schema_list:
-                if isinstance(item, list):
-                    flat_schema.extend(item)
-                else:
-                    flat_schema.append(item)
-
-            ai_feedback = {}
-            if use_ai:
-                status.text(f"[{i+1}/{total_rows}] 🤖 Analyzing: {display_name}...")
-                ai_feedback = analyze_with_gemini(
-                    data["Body Text"],
-                    {"Title": data["Title"], "Meta Description": data["Meta Description"]},
-                    flat_schema,
-                    creds,
-                )
+            flat_schema = task["flat_schema"]
+            ai_feedback = task.get("ai_feedback", {})
 
             final_score, score_log = calculate_score(data, ai_feedback)
-            google_test_url = f"https://search.google.com/test/rich-results?url={urllib.parse.quote(url)}"
+            google_test_url = f"https://search.google.com/test/rich-results?url={_quoted(url)}"
 
             results.append(
                 {
@@ -365,8 +871,6 @@ if st.button("Run Audit", type="primary"):
                 }
             )
 
-        bar.progress((i + 1) / total_rows)
-
     if processed == 0:
         status.warning(
             "Audit finished but **zero valid URLs** were found.\n\n"
@@ -379,23 +883,7 @@ if st.button("Run Audit", type="primary"):
         st.session_state["seo_results"] = results
 
 if st.session_state["seo_results"]:
-    df = pd.DataFrame(st.session_state["seo_results"])
-
-    def color_rows(val):
-        if val == "High" or val == "✅ Optimal":
-            return "color: green; font-weight: bold"
-        if val == "Low":
-            return "color: red; font-weight: bold"
-        return ""
-
-    def color_score(val):
-        if isinstance(val, (int, float)):
-            if val >= 90:
-                return "background-color: #d4edda; color: black; font-weight: bold"
-            if val >= 70:
-                return "background-color: #fff3cd; color: black; font-weight: bold"
-            return "background-color: #f8d7da; color: black; font-weight: bold"
-        return ""
+    report = st.session_state["seo_results"]
 
     cols = [
         "Page Title",
@@ -410,12 +898,14 @@ if st.session_state["seo_results"]:
         "💊 Rx Schema",
         "Verify",
     ]
-    display_cols = [c for c in cols if c in df.columns]
+    display_cols = [c for c in cols if any(c in r for r in report)]
+    display_rows = [{c: r.get(c, "") for c in display_cols} for r in report]
 
+    # Hand the records straight to st.dataframe: no DataFrame/Styler
+    # intermediate and no per-cell Python styling callbacks. The Score
+    # progress column carries the health signal.
     st.dataframe(
-        df[display_cols]
-        .style.applymap(color_rows)
-        .applymap(color_score, subset=["Score"] if "Score" in df.columns else None),
+        display_rows,
         column_config={
             "Verify": st.column_config.LinkColumn("Google Tool"),
             "URL": st.column_config.LinkColumn("Live Page"),
@@ -424,5 +914,9 @@ if st.session_state["seo_results"]:
         use_container_width=True,
     )
 
-    csv_bytes = df[display_cols].to_csv(index=False).encode("utf-8")
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=display_cols)
+    writer.writeheader()
+    writer.writerows(display_rows)
+    csv_bytes = buf.getvalue().encode("utf-8")
     st.download_button("📥 Download Report", csv_bytes, "ai_seo_audit.csv", "text/csv")